@@ -2,8 +2,11 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from app.database import engine, Base
+from app.database import engine, Base, SessionLocal
 from app.routers import devices, readings, incidents, auth, dashboard
+from app.services.liveness import seed_monitor, run_monitor
+from contextlib import asynccontextmanager, suppress
+import asyncio
 import logging
 
 logging.basicConfig(
@@ -13,7 +16,20 @@ logging.basicConfig(
 
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Flood Monitoring System", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db = SessionLocal()
+    try:
+        seed_monitor(db)
+    finally:
+        db.close()
+    monitor_task = asyncio.create_task(run_monitor())
+    yield
+    monitor_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await monitor_task
+
+app = FastAPI(title="Flood Monitoring System", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
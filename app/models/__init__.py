@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Text
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -9,6 +9,13 @@ class RiskLevel(str, enum.Enum):
     WARNING = "warning"
     HIGH_RISK = "high_risk"
     CRITICAL = "critical"
+    OFFLINE = "offline"  # incidents only: device stopped reporting
+
+class ReportReason(str, enum.Enum):
+    CHANGE = "change"        # level moved beyond the client's deadband
+    THRESHOLD = "threshold"  # level crossed a risk boundary
+    RISE = "rise"            # client is in fast mode due to a high rate of rise
+    HEARTBEAT = "heartbeat"  # nothing changed, periodic keep-alive
 
 class Device(Base):
     __tablename__ = "devices"
@@ -28,6 +35,7 @@ class Reading(Base):
     device_id = Column(String, ForeignKey("devices.id"), nullable=False)
     water_level = Column(Float, nullable=False)
     risk_level = Column(Enum(RiskLevel), nullable=False)
+    report_reason = Column(Enum(ReportReason), nullable=True)  # None for fixed-interval clients
     timestamp = Column(DateTime, default=datetime.utcnow)
 
     device = relationship("Device", back_populates="readings")
@@ -44,6 +52,19 @@ class Incident(Base):
 
     device = relationship("Device", back_populates="incidents")
 
+class BackfillCheckpoint(Base):
+    """Per-device progress of `python -m app.reclassify`, committed with each chunk."""
+    __tablename__ = "backfill_checkpoints"
+
+    device_id = Column(String, ForeignKey("devices.id"), primary_key=True)
+    last_timestamp = Column(DateTime, nullable=True)  # keyset position: (timestamp, id)
+    last_reading_id = Column(Integer, nullable=True)
+    state = Column(Text, nullable=True)  # JSON replay state (rapid-rise window, open incidents)
+    rules_fingerprint = Column(String, nullable=True)  # risk rules the progress was computed with
+    readings_done = Column(Integer, default=0)
+    completed_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class AdminUser(Base):
     __tablename__ = "admin_users"
 
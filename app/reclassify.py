@@ -0,0 +1,273 @@
+"""
+Reclassify stored readings and rebuild incident history.
+
+Replays every device's readings in timestamp order through the current
+assess_risk() rules, bulk-updates rows whose risk_level changed and rebuilds
+the device's incidents the way create_or_update_incident() would have, using
+each reading's own timestamp. Devices are processed in parallel, one per
+worker process. Progress is checkpointed in backfill_checkpoints with every
+chunk, so an interrupted run resumes where it stopped. Checkpoints record a
+fingerprint of the risk rules; devices completed under different rules, or
+whose reading count changed since (imports), are recomputed from scratch.
+
+Run it with ingestion paused (or on imported history only): a device's
+incidents are replaced, and live readings arriving mid-run are not replayed.
+
+Usage:
+  python -m app.reclassify                     # all devices, resume or recompute as needed
+  python -m app.reclassify --device river_001 --workers 4 --chunk-size 10000
+  python -m app.reclassify --restart           # force a full recompute
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from sqlalchemy import func, select, tuple_, update
+
+from app import models
+from app.database import engine, SessionLocal
+from app.models import RiskLevel
+from app.services import risk as risk_rules
+from app.services.risk import assess_risk, incident_message, RAPID_RISE_CM, RAPID_RISE_WINDOW
+
+logger = logging.getLogger("reclassify")
+
+def rules_fingerprint() -> str:
+    """Identifies the thresholds and classification code the replay applies."""
+    rules = {
+        "thresholds": [risk_rules.WARNING_CM, risk_rules.HIGH_RISK_CM, risk_rules.CRITICAL_CM],
+        "rapid_rise": [RAPID_RISE_CM, RAPID_RISE_WINDOW.total_seconds()],
+        # Edits to the rule functions themselves also invalidate completed checkpoints
+        "code": [inspect.getsource(f) for f in (risk_rules.classify_risk, assess_risk, incident_message)],
+    }
+    return hashlib.sha256(json.dumps(rules).encode()).hexdigest()[:16]
+
+class DeviceReplay:
+    """In-memory replay of the ingestion path for one device."""
+
+    def __init__(self, device_id: str, window=(), open_incidents=None):
+        self.device_id = device_id
+        self.window = deque(window)  # (timestamp, level) within RAPID_RISE_WINDOW
+        self.open = dict(open_incidents or {})  # RiskLevel -> Incident (this chunk) or id (earlier chunk)
+        self.created = []
+        self.resolved = []  # bulk update params for incidents written in earlier chunks
+        self.incidents_created = 0
+
+    def feed(self, level: float, ts: datetime) -> RiskLevel:
+        while self.window and self.window[0][0] < ts - RAPID_RISE_WINDOW:
+            self.window.popleft()
+        rapid_rise = bool(self.window) and (level - self.window[0][1]) > RAPID_RISE_CM
+        self.window.append((ts, level))
+        risk = assess_risk(level, rapid_rise)
+
+        # Same rules as create_or_update_incident()
+        if risk == RiskLevel.SAFE:
+            for inc in self.open.values():
+                if isinstance(inc, models.Incident):
+                    inc.resolved_at = ts
+                else:
+                    self.resolved.append({"id": inc, "resolved_at": ts})
+            self.open.clear()
+        elif risk not in self.open:
+            inc = models.Incident(
+                device_id=self.device_id,
+                risk_level=risk,
+                triggered_at=ts,
+                message=incident_message(risk, rapid_rise),
+            )
+            self.created.append(inc)
+            self.open[risk] = inc
+        return risk
+
+    def flush(self, db):
+        """Write this chunk's incident changes; keeps only ids of still-open incidents."""
+        db.add_all(self.created)
+        if self.resolved:
+            db.execute(update(models.Incident), self.resolved)
+        db.flush()
+        self.open = {risk: getattr(inc, "id", inc) for risk, inc in self.open.items()}
+        self.incidents_created += len(self.created)
+        self.created = []
+        self.resolved = []
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "window": [[ts.isoformat(), level] for ts, level in self.window],
+            "open": {risk.value: inc_id for risk, inc_id in self.open.items()},
+        })
+
+    @classmethod
+    def from_json(cls, device_id: str, state: str) -> "DeviceReplay":
+        data = json.loads(state)
+        return cls(
+            device_id,
+            window=[(datetime.fromisoformat(ts), level) for ts, level in data["window"]],
+            open_incidents={RiskLevel(risk): inc_id for risk, inc_id in data["open"].items()},
+        )
+
+def _init_worker():
+    # Pooled connections inherited from the parent over fork must not be reused
+    engine.dispose(close=False)
+
+def process_device(device_id: str, chunk_size: int, fingerprint: str) -> dict:
+    started = time.perf_counter()
+    stats = {"device_id": device_id, "readings": 0, "changed": 0, "incidents": 0, "skipped": False}
+    db = SessionLocal()
+    try:
+        checkpoint = db.get(models.BackfillCheckpoint, device_id)
+        stale = None
+        if checkpoint and checkpoint.rules_fingerprint != fingerprint:
+            stale = "risk rules changed since last run"
+        elif checkpoint and checkpoint.completed_at:
+            count = db.query(func.count(models.Reading.id)).filter(models.Reading.device_id == device_id).scalar()
+            if count != checkpoint.readings_done:
+                stale = f"{count - checkpoint.readings_done:+d} readings since last run"
+        if stale:
+            logger.info(f"{device_id}: {stale}, recomputing from scratch")
+            db.delete(checkpoint)
+            db.flush()
+            checkpoint = None
+        if checkpoint and checkpoint.completed_at:
+            stats["skipped"] = True
+            return stats
+        if checkpoint is None or checkpoint.state is None:
+            checkpoint = checkpoint or models.BackfillCheckpoint(device_id=device_id, readings_done=0)
+            checkpoint.rules_fingerprint = fingerprint
+            db.add(checkpoint)
+            # Committed with the first chunk, so a crash before it leaves history intact.
+            # Offline incidents come from the liveness monitor, not readings, and are kept.
+            db.query(models.Incident).filter(
+                models.Incident.device_id == device_id,
+                models.Incident.risk_level != RiskLevel.OFFLINE,
+            ).delete(synchronize_session=False)
+            replay = DeviceReplay(device_id)
+        else:
+            replay = DeviceReplay.from_json(device_id, checkpoint.state)
+            logger.info(f"Resuming {device_id} after {checkpoint.readings_done} readings")
+
+        while True:
+            query = (
+                select(models.Reading.id, models.Reading.water_level, models.Reading.risk_level, models.Reading.timestamp)
+                .where(models.Reading.device_id == device_id)
+                .order_by(models.Reading.timestamp, models.Reading.id)
+                .limit(chunk_size)
+            )
+            if checkpoint.last_reading_id is not None:
+                query = query.where(
+                    tuple_(models.Reading.timestamp, models.Reading.id)
+                    > tuple_(checkpoint.last_timestamp, checkpoint.last_reading_id)
+                )
+            rows = db.execute(query).all()
+            if not rows:
+                break
+
+            updates = []
+            for reading_id, level, old_risk, ts in rows:
+                risk = replay.feed(level, ts)
+                if risk != old_risk:
+                    updates.append({"id": reading_id, "risk_level": risk})
+            if updates:
+                db.execute(update(models.Reading), updates)
+            replay.flush(db)
+
+            checkpoint.last_timestamp = rows[-1].timestamp
+            checkpoint.last_reading_id = rows[-1].id
+            checkpoint.readings_done += len(rows)
+            checkpoint.state = replay.to_json()
+            db.commit()
+
+            stats["readings"] += len(rows)
+            stats["changed"] += len(updates)
+            logger.debug(f"{device_id}: {checkpoint.readings_done} readings done")
+            if len(rows) < chunk_size:
+                break
+
+        checkpoint.completed_at = datetime.utcnow()
+        checkpoint.state = replay.to_json()
+        db.commit()
+        stats["incidents"] = replay.incidents_created
+        return stats
+    finally:
+        db.close()
+        stats["elapsed_s"] = time.perf_counter() - started
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Reclassify readings and rebuild incident history.")
+    parser.add_argument("--device", action="append", dest="devices", help="device id (repeatable, default: all)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="readings per fetch/commit")
+    parser.add_argument("--restart", action="store_true", help="discard checkpoints and recompute everything")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    models.BackfillCheckpoint.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        device_ids = args.devices or [d for (d,) in db.query(models.Device.id).order_by(models.Device.id)]
+        if args.restart:
+            db.query(models.BackfillCheckpoint).filter(
+                models.BackfillCheckpoint.device_id.in_(device_ids)
+            ).delete(synchronize_session=False)
+            db.commit()
+    finally:
+        db.close()
+    if not device_ids:
+        logger.info("No devices to reclassify")
+        return 0
+
+    workers = max(1, min(args.workers or 1, len(device_ids)))
+    fingerprint = rules_fingerprint()
+    logger.info(
+        f"Reclassifying {len(device_ids)} device(s) with {workers} worker(s), "
+        f"chunk={args.chunk_size}, rules={fingerprint}"
+    )
+    started = time.perf_counter()
+    total_readings = total_changed = failed = skipped = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(process_device, d, args.chunk_size, fingerprint): d for d in device_ids}
+        for future in as_completed(futures):
+            device_id = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                failed += 1
+                logger.error(f"{device_id} failed (rerun to resume from checkpoint): {e}")
+                continue
+            if stats["skipped"]:
+                skipped += 1
+                logger.info(f"{device_id}: already complete with rules {fingerprint}, skipped")
+                continue
+            rate = stats["readings"] / stats["elapsed_s"] if stats["elapsed_s"] else 0
+            logger.info(
+                f"{device_id}: {stats['readings']} readings, {stats['changed']} reclassified, "
+                f"{stats['incidents']} incidents in {stats['elapsed_s']:.1f}s ({rate:.0f} readings/s)"
+            )
+            total_readings += stats["readings"]
+            total_changed += stats["changed"]
+
+    elapsed = time.perf_counter() - started
+    if skipped == len(device_ids):
+        logger.info(
+            f"Nothing recomputed: every device is already reclassified with rules {fingerprint} "
+            f"(use --restart to force a full recompute)"
+        )
+        return 0
+    logger.info(
+        f"Done: {total_readings} readings, {total_changed} reclassified in {elapsed:.1f}s "
+        f"({total_readings / elapsed if elapsed else 0:.0f} readings/s), "
+        f"{skipped} device(s) already up to date, {failed} device(s) failed"
+    )
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app import models
 from app.services.auth import get_current_user
+from app.services.liveness import monitor, from_epoch
 from pydantic import BaseModel
 from typing import List
 from datetime import datetime
+import time
 
 router = APIRouter()
 
@@ -23,13 +25,29 @@ class DeviceOut(BaseModel):
     class Config:
         from_attributes = True
 
+class DeviceLiveness(BaseModel):
+    device_id: str
+    online: bool
+    last_seen: datetime
+    seconds_since_seen: float
+
+def _liveness(device_id: str, online: bool, last_seen: float, now: float) -> DeviceLiveness:
+    return DeviceLiveness(
+        device_id=device_id,
+        online=online,
+        last_seen=from_epoch(last_seen),
+        seconds_since_seen=round(now - last_seen, 1),
+    )
+
 @router.get("/", response_model=List[DeviceOut])
 def list_devices(db: Session = Depends(get_db)):
     return db.query(models.Device).all()
 
+# Handlers that read or write monitor state are async so they run on the event loop,
+# never in the threadpool concurrently with touch()/advance()
 @router.post("/", response_model=DeviceOut)
-def create_device(device: DeviceCreate, db: Session = Depends(get_db),
-                  current_user=Depends(get_current_user)):
+async def create_device(device: DeviceCreate, db: Session = Depends(get_db),
+                        current_user=Depends(get_current_user)):
     existing = db.query(models.Device).filter(models.Device.id == device.id).first()
     if existing:
         raise HTTPException(status_code=400, detail="Device ID already exists")
@@ -37,8 +55,28 @@ def create_device(device: DeviceCreate, db: Session = Depends(get_db),
     db.add(db_device)
     db.commit()
     db.refresh(db_device)
+    # Start the offline clock at registration so a gauge that never reports is noticed
+    monitor.touch(db_device.id)
     return db_device
 
+@router.get("/liveness", response_model=List[DeviceLiveness])
+async def list_liveness(offline_only: bool = False, offset: int = Query(0, ge=0),
+                        limit: int = Query(500, ge=1, le=5000)):
+    """Offline devices first, then online ones."""
+    now = time.time()
+    entries = [(d, False, ts) for d, ts in monitor.offline.items()]
+    if not offline_only:
+        entries += [(d, True, ts) for d, ts in monitor.last_seen.items()]
+    return [_liveness(d, online, ts, now) for d, online, ts in entries[offset:offset + limit]]
+
+@router.get("/{device_id}/liveness", response_model=DeviceLiveness)
+async def get_liveness(device_id: str):
+    status = monitor.status(device_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Device not found")
+    online, last_seen = status
+    return _liveness(device_id, online, last_seen, time.time())
+
 @router.get("/{device_id}", response_model=DeviceOut)
 def get_device(device_id: str, db: Session = Depends(get_db)):
     device = db.query(models.Device).filter(models.Device.id == device_id).first()
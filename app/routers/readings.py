@@ -2,8 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app import models
-from app.services.risk import classify_risk, check_rapid_rise, create_or_update_incident, should_escalate
-from app.services.alerts import send_telegram_alert
+from app.services.risk import assess_risk, check_rapid_rise, create_or_update_incident, should_escalate
+from app.services.alerts import send_telegram_alert, send_offline_alert, critical_realert_due
+from app.services.liveness import monitor, resolve_offline_incident, from_epoch
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
@@ -14,12 +15,14 @@ class ReadingCreate(BaseModel):
     device_id: str
     water_level_cm: float
     timestamp: Optional[datetime] = None
+    report_reason: Optional[models.ReportReason] = None
 
 class ReadingOut(BaseModel):
     id: int
     device_id: str
     water_level: float
     risk_level: str
+    report_reason: Optional[str] = None
     timestamp: datetime
 
     class Config:
@@ -37,6 +40,17 @@ async def process_alert(device_id: str, water_level: float, risk, rapid_rise: bo
             rapid_rise=rapid_rise,
         )
 
+async def process_back_online(device_id: str, last_seen: float, db: Session):
+    if resolve_offline_incident(db, device_id):
+        device = db.query(models.Device).filter(models.Device.id == device_id).first()
+        await send_offline_alert(
+            device_id=device_id,
+            device_name=device.name,
+            location=device.location,
+            last_seen=from_epoch(last_seen),
+            back_online=True,
+        )
+
 @router.post("/", response_model=ReadingOut)
 async def submit_reading(reading: ReadingCreate, background_tasks: BackgroundTasks,
                          db: Session = Depends(get_db)):
@@ -45,19 +59,21 @@ async def submit_reading(reading: ReadingCreate, background_tasks: BackgroundTas
     if not device:
         raise HTTPException(status_code=404, detail=f"Device '{reading.device_id}' not found. Register it first.")
 
-    # Classify risk
-    risk = classify_risk(reading.water_level_cm)
-    rapid_rise = check_rapid_rise(db, reading.device_id, reading.water_level_cm)
+    # Liveness: O(1), the monitor's wheel does the rest
+    offline_since = monitor.touch(reading.device_id)
+    if offline_since is not None:
+        background_tasks.add_task(process_back_online, reading.device_id, offline_since, db)
 
-    # If rapid rise, escalate risk level
-    if rapid_rise and risk == models.RiskLevel.WARNING:
-        risk = models.RiskLevel.HIGH_RISK
+    # Classify risk, escalating on rapid rise
+    rapid_rise = check_rapid_rise(db, reading.device_id, reading.water_level_cm)
+    risk = assess_risk(reading.water_level_cm, rapid_rise)
 
     # Store reading
     db_reading = models.Reading(
         device_id=reading.device_id,
         water_level=reading.water_level_cm,
         risk_level=risk,
+        report_reason=reading.report_reason,
         timestamp=reading.timestamp or datetime.utcnow(),
     )
     db.add(db_reading)
@@ -67,17 +83,22 @@ async def submit_reading(reading: ReadingCreate, background_tasks: BackgroundTas
     # Create/update incident
     incident = create_or_update_incident(db, reading.device_id, risk, rapid_rise)
 
-    # Send alert in background if new incident or critical
-    if incident or risk == models.RiskLevel.CRITICAL:
+    # Send alert in background if new incident, or as a throttled reminder while critical
+    # (clients in fast mode report every few seconds). Checked first so a new incident starts the clock.
+    critical_due = risk == models.RiskLevel.CRITICAL and critical_realert_due(reading.device_id)
+    if incident or critical_due:
         background_tasks.add_task(process_alert, reading.device_id, reading.water_level_cm, risk, rapid_rise, db)
 
     return db_reading
 
 @router.get("/", response_model=List[ReadingOut])
-def list_readings(device_id: Optional[str] = None, limit: int = 50, db: Session = Depends(get_db)):
+def list_readings(device_id: Optional[str] = None, report_reason: Optional[models.ReportReason] = None,
+                  limit: int = 50, db: Session = Depends(get_db)):
     query = db.query(models.Reading)
     if device_id:
         query = query.filter(models.Reading.device_id == device_id)
+    if report_reason:
+        query = query.filter(models.Reading.report_reason == report_reason)
     return query.order_by(models.Reading.timestamp.desc()).limit(limit).all()
 
 @router.get("/latest/{device_id}", response_model=ReadingOut)
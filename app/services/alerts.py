@@ -1,20 +1,54 @@
 import httpx
 import os
 import logging
+import time
+from datetime import datetime
+from typing import Dict
 from app.models import RiskLevel
 
 logger = logging.getLogger(__name__)
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN", "")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
+# Minimum gap between repeat alerts while a device stays CRITICAL
+CRITICAL_REALERT_S = float(os.getenv("CRITICAL_REALERT_S", "300"))
+
+_last_critical_alert: Dict[str, float] = {}
 
 RISK_EMOJI = {
     RiskLevel.SAFE: "✅",
     RiskLevel.WARNING: "⚠️",
     RiskLevel.HIGH_RISK: "🔴",
     RiskLevel.CRITICAL: "🚨",
+    RiskLevel.OFFLINE: "📴",
 }
 
+def critical_realert_due(device_id: str) -> bool:
+    """True (and restarts the clock) if a repeat CRITICAL alert may be sent for this device."""
+    now = time.time()
+    if now - _last_critical_alert.get(device_id, 0) < CRITICAL_REALERT_S:
+        return False
+    _last_critical_alert[device_id] = now
+    return True
+
+async def _send_message(message: str, device_id: str, tag: str):
+    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
+    payload = {
+        "chat_id": TELEGRAM_CHAT_ID,
+        "text": message,
+        "parse_mode": "Markdown",
+    }
+
+    try:
+        async with httpx.AsyncClient() as client:
+            resp = await client.post(url, json=payload, timeout=10)
+            if resp.status_code == 200:
+                logger.info(f"Telegram alert sent for {device_id} [{tag}]")
+            else:
+                logger.error(f"Telegram error: {resp.text}")
+    except Exception as e:
+        logger.error(f"Failed to send Telegram alert: {e}")
+
 async def send_telegram_alert(device_id: str, device_name: str, location: str,
                                water_level: float, risk: RiskLevel, rapid_rise: bool = False):
     if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID:
@@ -32,20 +66,26 @@ async def send_telegram_alert(device_id: str, device_name: str, location: str,
         f"{rapid_tag}\n\n"
         f"⏰ Please take immediate action if required."
     )
+    await _send_message(message, device_id, risk.value)
 
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    payload = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": message,
-        "parse_mode": "Markdown",
-    }
+async def send_offline_alert(device_id: str, device_name: str, location: str,
+                             last_seen: datetime, back_online: bool = False):
+    if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID:
+        logger.info("Telegram not configured, skipping alert")
+        return
 
-    try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(url, json=payload, timeout=10)
-            if resp.status_code == 200:
-                logger.info(f"Telegram alert sent for {device_id} [{risk.value}]")
-            else:
-                logger.error(f"Telegram error: {resp.text}")
-    except Exception as e:
-        logger.error(f"Failed to send Telegram alert: {e}")
+    if back_online:
+        title = "✅ *DEVICE BACK ONLINE*"
+        footer = "Readings are being received again."
+    else:
+        title = f"{RISK_EMOJI[RiskLevel.OFFLINE]} *DEVICE OFFLINE*"
+        footer = "⏰ The gauge may be damaged or submerged — check on site."
+
+    message = (
+        f"{title}\n\n"
+        f"📍 *Location:* {location}\n"
+        f"🔧 *Device:* {device_name} ({device_id})\n"
+        f"🕒 *Last Seen:* {last_seen:%Y-%m-%d %H:%M} UTC\n\n"
+        f"{footer}"
+    )
+    await _send_message(message, device_id, "online" if back_online else "offline")
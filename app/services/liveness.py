@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app import models
+from app.database import SessionLocal
+from app.models import RiskLevel
+from app.services.alerts import send_offline_alert
+
+logger = logging.getLogger(__name__)
+
+# 3 missed sensor-client heartbeats (HEARTBEAT_S=300) before a device counts as offline
+OFFLINE_AFTER_S = float(os.getenv("OFFLINE_AFTER_S", "900"))
+LIVENESS_TICK_S = float(os.getenv("LIVENESS_TICK_S", "1"))
+ALERT_CONCURRENCY = 10  # parallel Telegram calls when many gauges drop out together
+
+def to_epoch(dt: datetime) -> float:
+    """Naive UTC datetime (as stored in the DB) -> epoch seconds."""
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+def from_epoch(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).replace(tzinfo=None)
+
+class LivenessMonitor:
+    """Hashed timer wheel of device deadlines.
+
+    touch() only records the last-seen time, so the per-reading cost is a dict
+    write. Each online device is scheduled in a slot; when its slot comes due the
+    deadline is re-checked against last-seen and the device is either reported
+    offline or moved to the slot of its new deadline. Work per tick is
+    proportional to the devices due in that slot, not to the fleet size.
+    Offline devices leave the wheel until they are touched again.
+
+    State is in-process: run the API with a single worker. It is not locked, so
+    touch(), advance() and iteration must happen on the event loop (async
+    handlers); worker threads may only do single lookups via status().
+    """
+
+    def __init__(self, timeout_s: float = OFFLINE_AFTER_S, tick_s: float = LIVENESS_TICK_S):
+        self.timeout_s = timeout_s
+        self.tick_s = tick_s
+        # +2 so a deadline up to timeout_s ahead never wraps onto the slot being processed
+        self._slots: List[Set[str]] = [set() for _ in range(math.ceil(timeout_s / tick_s) + 2)]
+        self._tick = int(time.time() // tick_s)  # first tick not yet processed
+        self.last_seen: Dict[str, float] = {}  # online devices, epoch seconds
+        self.offline: Dict[str, float] = {}    # offline devices -> last seen
+
+    def _schedule(self, device_id: str, deadline: float):
+        tick = max(int(deadline // self.tick_s), self._tick)
+        self._slots[tick % len(self._slots)].add(device_id)
+
+    def touch(self, device_id: str, now: Optional[float] = None) -> Optional[float]:
+        """Record activity. Returns the previous last-seen time if the device was offline."""
+        now = time.time() if now is None else now
+        was_offline = self.offline.pop(device_id, None)
+        if device_id not in self.last_seen:
+            self.last_seen[device_id] = now
+            self._schedule(device_id, now + self.timeout_s)
+        elif now > self.last_seen[device_id]:
+            self.last_seen[device_id] = now
+        return was_offline
+
+    def seed(self, device_id: str, last_seen: float, now: Optional[float] = None):
+        """Track a device with a known last-seen time, giving it a full timeout from now.
+
+        Nothing could reach the server while it was down, so at startup a stale
+        last-seen time says nothing about the device. The real time is kept for
+        display; a device that was already dead is flagged timeout_s from now.
+        """
+        now = time.time() if now is None else now
+        self.offline.pop(device_id, None)
+        self.last_seen[device_id] = last_seen
+        self._schedule(device_id, max(last_seen, now) + self.timeout_s)
+
+    def mark_offline(self, device_id: str, last_seen: float):
+        """Seed a device already known to be offline (e.g. open incident at startup)."""
+        self.last_seen.pop(device_id, None)  # its wheel entry is dropped when the slot comes due
+        self.offline[device_id] = last_seen
+
+    def advance(self, now: Optional[float] = None) -> List[Tuple[str, float]]:
+        """Process every fully elapsed tick. Returns newly offline (device_id, last_seen)."""
+        now = time.time() if now is None else now
+        end = int(now // self.tick_s)
+        # After a long stall one pass over the wheel re-checks every device
+        start = max(self._tick, end - len(self._slots))
+        self._tick = max(self._tick, end)
+        expired = []
+        for tick in range(start, end):
+            idx = tick % len(self._slots)
+            due, self._slots[idx] = self._slots[idx], set()
+            for device_id in due:
+                last = self.last_seen.get(device_id)
+                if last is None:
+                    continue
+                if last + self.timeout_s <= now:
+                    del self.last_seen[device_id]
+                    self.offline[device_id] = last
+                    expired.append((device_id, last))
+                else:
+                    self._schedule(device_id, last + self.timeout_s)
+        return expired
+
+    def status(self, device_id: str) -> Optional[Tuple[bool, float]]:
+        """(online, last_seen) or None if the device is unknown."""
+        if device_id in self.last_seen:
+            return True, self.last_seen[device_id]
+        if device_id in self.offline:
+            return False, self.offline[device_id]
+        return None
+
+monitor = LivenessMonitor()
+
+def seed_monitor(db: Session, now: Optional[float] = None):
+    """Load last-seen times once at startup; every online device gets a full timeout from now."""
+    now = time.time() if now is None else now
+    last_readings = dict(
+        db.query(models.Reading.device_id, func.max(models.Reading.timestamp))
+        .group_by(models.Reading.device_id)
+        .all()
+    )
+    offline_ids = {
+        device_id for (device_id,) in db.query(models.Incident.device_id).filter(
+            models.Incident.risk_level == RiskLevel.OFFLINE,
+            models.Incident.resolved_at == None,
+        )
+    }
+    for (device_id,) in db.query(models.Device.id):
+        last = last_readings.get(device_id)
+        last = to_epoch(last) if last else now
+        if device_id in offline_ids:
+            monitor.mark_offline(device_id, last)
+        else:
+            monitor.seed(device_id, last, now)
+    logger.info(f"Liveness monitor tracking {len(monitor.last_seen)} online, {len(monitor.offline)} offline devices")
+
+def _back_online(device_id: str) -> bool:
+    status = monitor.status(device_id)
+    return status is not None and status[0]
+
+def open_offline_incidents(db: Session, expired: List[Tuple[str, float]]) -> List[Tuple[str, str, str, datetime]]:
+    """Create one OFFLINE incident per newly silent device; returns those to alert on.
+
+    Runs off the event loop, so a device can report again at any point. Devices
+    already back online are skipped, and incidents whose device came back while
+    they were being written are resolved here, because the ingestion path may
+    have looked for them before the commit and found nothing.
+    """
+    last_seen = {device_id: from_epoch(ts) for device_id, ts in expired if not _back_online(device_id)}
+    if not last_seen:
+        return []
+    already_open = {
+        device_id for (device_id,) in db.query(models.Incident.device_id).filter(
+            models.Incident.device_id.in_(last_seen),
+            models.Incident.risk_level == RiskLevel.OFFLINE,
+            models.Incident.resolved_at == None,
+        )
+    }
+    created = []
+    for device in db.query(models.Device).filter(models.Device.id.in_(last_seen.keys() - already_open)):
+        seen = last_seen[device.id]
+        incident = models.Incident(
+            device_id=device.id,
+            risk_level=RiskLevel.OFFLINE,
+            message=f"No readings since {seen:%Y-%m-%d %H:%M} UTC",
+        )
+        db.add(incident)
+        created.append((incident, (device.id, device.name, device.location, seen)))
+    db.commit()
+
+    newly_offline = []
+    for incident, device in created:
+        if _back_online(incident.device_id):
+            incident.resolved_at = datetime.utcnow()
+            logger.info(f"Device {incident.device_id} reported again while going offline, resolved #{incident.id}")
+        else:
+            newly_offline.append(device)
+            logger.warning(f"Device {device[0]} offline, last seen {device[3]:%Y-%m-%d %H:%M:%S} UTC")
+    db.commit()
+    return newly_offline
+
+def resolve_offline_incident(db: Session, device_id: str) -> bool:
+    open_incidents = (
+        db.query(models.Incident)
+        .filter(
+            models.Incident.device_id == device_id,
+            models.Incident.risk_level == RiskLevel.OFFLINE,
+            models.Incident.resolved_at == None,
+        )
+        .all()
+    )
+    for inc in open_incidents:
+        inc.resolved_at = datetime.utcnow()
+        logger.info(f"Resolved offline incident #{inc.id} for {device_id}")
+    db.commit()
+    return bool(open_incidents)
+
+def _open_offline_incidents(expired: List[Tuple[str, float]]):
+    db = SessionLocal()
+    try:
+        return open_offline_incidents(db, expired)
+    finally:
+        db.close()
+
+async def _send_offline_alerts(newly_offline: List[Tuple[str, str, str, datetime]], limit: asyncio.Semaphore):
+    async def send(device_id, name, location, seen):
+        async with limit:
+            await send_offline_alert(device_id, name, location, seen)
+    await asyncio.gather(*(send(*device) for device in newly_offline))
+
+async def run_monitor():
+    """Background task: advance the wheel every tick and raise incidents for silent devices."""
+    alert_limit = asyncio.Semaphore(ALERT_CONCURRENCY)
+    alert_tasks: Set[asyncio.Task] = set()
+    # Expired devices have already left the wheel, so a batch that fails to record is retried here
+    pending: List[Tuple[str, float]] = []
+    batch: Optional[asyncio.Future] = None
+    try:
+        while True:
+            await asyncio.sleep(monitor.tick_s)
+            pending += monitor.advance()
+            if not pending:
+                continue
+            # A flood knocking out many gauges at once must not stall request handling.
+            # Shielded so cancelling this task on shutdown doesn't abandon a commit mid-way.
+            batch = asyncio.ensure_future(asyncio.to_thread(_open_offline_incidents, pending))
+            try:
+                newly_offline = await asyncio.shield(batch)
+            except Exception as e:
+                logger.error(f"Failed to record {len(pending)} offline device(s), retrying next tick: {e}")
+                continue
+            pending = []
+            # Telegram calls can take seconds each; keep them off the tick loop
+            task = asyncio.create_task(_send_offline_alerts(newly_offline, alert_limit))
+            alert_tasks.add(task)
+            task.add_done_callback(alert_tasks.discard)
+    except asyncio.CancelledError:
+        if batch is not None and not batch.done():
+            logger.info("Liveness monitor stopping: waiting for the offline batch being written")
+            await asyncio.wait([batch])
+            if batch.exception() is None:
+                pending = []
+        if pending:
+            logger.warning(
+                f"Liveness monitor stopped; {len(pending)} offline device(s) not recorded: "
+                f"{', '.join(sorted({device_id for device_id, _ in pending}))}"
+            )
+        if alert_tasks:
+            logger.warning(f"Liveness monitor stopped; cancelling {len(alert_tasks)} offline alert batch(es)")
+            for task in alert_tasks:
+                task.cancel()
+            await asyncio.gather(*alert_tasks, return_exceptions=True)
+        raise
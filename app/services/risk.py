@@ -6,19 +6,38 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+WARNING_CM = 30
+HIGH_RISK_CM = 60
+CRITICAL_CM = 90
+RAPID_RISE_CM = 15
+RAPID_RISE_WINDOW = timedelta(minutes=10)
+
 def classify_risk(water_level: float) -> RiskLevel:
-    if water_level < 30:
+    if water_level < WARNING_CM:
         return RiskLevel.SAFE
-    elif water_level < 60:
+    elif water_level < HIGH_RISK_CM:
         return RiskLevel.WARNING
-    elif water_level < 90:
+    elif water_level < CRITICAL_CM:
         return RiskLevel.HIGH_RISK
     else:
         return RiskLevel.CRITICAL
 
+def assess_risk(water_level: float, rapid_rise: bool) -> RiskLevel:
+    """Classify a reading, escalating WARNING to HIGH_RISK on a rapid rise."""
+    risk = classify_risk(water_level)
+    if rapid_rise and risk == RiskLevel.WARNING:
+        risk = RiskLevel.HIGH_RISK
+    return risk
+
+def incident_message(risk: RiskLevel, rapid_rise: bool = False) -> str:
+    msg = f"Water level crossed {risk.value} threshold"
+    if rapid_rise:
+        msg += " (RAPID RISE detected)"
+    return msg
+
 def check_rapid_rise(db: Session, device_id: str, current_level: float) -> bool:
     """Returns True if water rose more than 15cm in last 10 minutes."""
-    ten_mins_ago = datetime.utcnow() - timedelta(minutes=10)
+    ten_mins_ago = datetime.utcnow() - RAPID_RISE_WINDOW
     oldest_recent = (
         db.query(models.Reading)
         .filter(
@@ -28,7 +47,7 @@ def check_rapid_rise(db: Session, device_id: str, current_level: float) -> bool:
         .order_by(models.Reading.timestamp.asc())
         .first()
     )
-    if oldest_recent and (current_level - oldest_recent.water_level) > 15:
+    if oldest_recent and (current_level - oldest_recent.water_level) > RAPID_RISE_CM:
         logger.warning(f"Rapid rise detected for {device_id}: +{current_level - oldest_recent.water_level:.1f}cm in 10 min")
         return True
     return False
@@ -58,11 +77,12 @@ def should_escalate(db: Session, device_id: str, risk: RiskLevel) -> bool:
 
 def create_or_update_incident(db: Session, device_id: str, risk: RiskLevel, rapid_rise: bool = False) -> None:
     if risk == RiskLevel.SAFE:
-        # Resolve any open incidents for this device
+        # Resolve any open incidents for this device (offline ones belong to the liveness monitor)
         open_incidents = (
             db.query(models.Incident)
             .filter(
                 models.Incident.device_id == device_id,
+                models.Incident.risk_level != RiskLevel.OFFLINE,
                 models.Incident.resolved_at == None,
             )
             .all()
@@ -85,13 +105,10 @@ def create_or_update_incident(db: Session, device_id: str, risk: RiskLevel, rapi
     )
 
     if not existing:
-        msg = f"Water level crossed {risk.value} threshold"
-        if rapid_rise:
-            msg += " (RAPID RISE detected)"
         incident = models.Incident(
             device_id=device_id,
             risk_level=risk,
-            message=msg,
+            message=incident_message(risk, rapid_rise),
         )
         db.add(incident)
         db.commit()
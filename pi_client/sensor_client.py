@@ -3,6 +3,11 @@
 Raspberry Pi Flood Sensor Client
 Reads from HC-SR04 ultrasonic sensor (or simulates) and posts to backend.
 
+Reports by exception: the sensor is sampled every SAMPLE_S seconds but a
+reading is only sent when the level moves beyond DEADBAND_CM, crosses a risk
+boundary, or HEARTBEAT_S elapses. While the water is rising faster than
+RAPID_RISE_CM_PER_MIN the client drops to FAST_INTERVAL_S and sends every sample.
+
 Wiring:
   VCC  → 5V (Pin 2)
   GND  → GND (Pin 6)
@@ -12,7 +17,10 @@ Wiring:
 
 import time
 import requests
+from bisect import bisect_right
+from collections import deque
 from datetime import datetime, timezone
+from typing import Optional
 import os
 import logging
 
@@ -22,9 +30,20 @@ logger = logging.getLogger("pi-client")
 # ─── CONFIG ────────────────────────────────────────────────────────────────────
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
 DEVICE_ID   = os.getenv("DEVICE_ID",   "river_001")
-INTERVAL_S  = int(os.getenv("INTERVAL_S", "30"))  # send every 30 seconds
 SIMULATE    = os.getenv("SIMULATE", "true").lower() == "true"
 
+# Adaptive reporting
+SAMPLE_S              = float(os.getenv("SAMPLE_S", "10"))         # calm sampling interval
+FAST_INTERVAL_S       = float(os.getenv("FAST_INTERVAL_S", "5"))   # sample + send interval while rising fast
+HEARTBEAT_S           = float(os.getenv("HEARTBEAT_S", "300"))     # send at least this often
+DEADBAND_CM           = float(os.getenv("DEADBAND_CM", "3"))       # min change since last send
+HYSTERESIS_CM         = float(os.getenv("HYSTERESIS_CM", "2"))     # margin below a boundary before a drop counts
+RAPID_RISE_CM_PER_MIN = float(os.getenv("RAPID_RISE_CM_PER_MIN", "1.5"))  # backend: 15cm / 10 min
+RATE_WINDOW_S         = float(os.getenv("RATE_WINDOW_S", "120"))   # samples used for rate estimate
+
+# Must match classify_risk() on the backend: SAFE < 30 <= WARNING < 60 <= HIGH_RISK < 90 <= CRITICAL
+RISK_THRESHOLDS_CM = (30, 60, 90)
+
 # Ultrasonic GPIO pins (only used if SIMULATE=false)
 TRIG_PIN = 23
 ECHO_PIN = 24
@@ -71,32 +90,104 @@ def get_water_level_cm() -> float:
         water_level = SENSOR_HEIGHT_CM - distance
         return round(max(0, water_level), 1)
 
-def send_reading(water_level: float):
+def risk_band(water_level: float) -> int:
+    """Index of the risk band (0 = SAFE ... 3 = CRITICAL) for a water level."""
+    return bisect_right(RISK_THRESHOLDS_CM, water_level)
+
+class AdaptiveReporter:
+    """Decides when a sample is worth sending and how long to sleep before the next one."""
+
+    def __init__(self):
+        self.samples = deque()  # (monotonic time, level) within RATE_WINDOW_S
+        self.last_sent_level: Optional[float] = None
+        self.last_sent_at: Optional[float] = None
+        self.fast = False
+
+    def rate_cm_per_min(self) -> float:
+        """Least-squares slope of recent samples; robust to single-sample sensor noise."""
+        # Too short a span and sensor noise dominates the slope
+        if len(self.samples) < 3 or self.samples[-1][0] - self.samples[0][0] < RATE_WINDOW_S / 2:
+            return 0.0
+        n = len(self.samples)
+        mean_t = sum(t for t, _ in self.samples) / n
+        mean_l = sum(l for _, l in self.samples) / n
+        var_t = sum((t - mean_t) ** 2 for t, _ in self.samples)
+        if var_t == 0:
+            return 0.0
+        cov = sum((t - mean_t) * (l - mean_l) for t, l in self.samples)
+        return cov / var_t * 60
+
+    def observe(self, level: float, now: float) -> Optional[str]:
+        """Record a sample and return the report reason, or None if it should not be sent."""
+        self.samples.append((now, level))
+        while self.samples and now - self.samples[0][0] > RATE_WINDOW_S:
+            self.samples.popleft()
+
+        # Enter fast mode at the rapid-rise rate, leave it only once the rise has halved
+        rate = self.rate_cm_per_min()
+        if not self.fast and rate >= RAPID_RISE_CM_PER_MIN:
+            self.fast = True
+            logger.warning(f"Rapid rise {rate:+.1f}cm/min — reporting every {FAST_INTERVAL_S}s")
+        elif self.fast and rate < RAPID_RISE_CM_PER_MIN / 2:
+            self.fast = False
+            logger.info(f"Rise eased to {rate:+.1f}cm/min — back to report-by-exception")
+
+        if self.last_sent_level is None:
+            return "change"
+        # Rising into a worse band is reported at once; only drops need the margin, to stop chatter
+        last_band = risk_band(self.last_sent_level)
+        if risk_band(level) > last_band or risk_band(level + HYSTERESIS_CM) < last_band:
+            return "threshold"
+        if self.fast:
+            return "rise"
+        if abs(level - self.last_sent_level) >= DEADBAND_CM:
+            return "change"
+        if now - self.last_sent_at >= HEARTBEAT_S:
+            return "heartbeat"
+        return None
+
+    def mark_sent(self, level: float, now: float):
+        self.last_sent_level = level
+        self.last_sent_at = now
+
+    def next_interval(self) -> float:
+        return FAST_INTERVAL_S if self.fast else SAMPLE_S
+
+def send_reading(water_level: float, report_reason: Optional[str] = None) -> bool:
     payload = {
         "device_id": DEVICE_ID,
         "water_level_cm": water_level,
         "timestamp": datetime.now(timezone.utc).isoformat(),
+        "report_reason": report_reason,
     }
     try:
         resp = requests.post(f"{BACKEND_URL}/readings/", json=payload, timeout=10)
         if resp.status_code == 200:
             data = resp.json()
-            logger.info(f"Sent: {water_level}cm → risk={data['risk_level']}")
+            logger.info(f"Sent [{report_reason}]: {water_level}cm → risk={data['risk_level']}")
+            return True
         else:
             logger.error(f"Backend error {resp.status_code}: {resp.text}")
     except requests.exceptions.ConnectionError:
         logger.error(f"Cannot reach backend at {BACKEND_URL}")
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
+    return False
 
 # ─── MAIN LOOP ─────────────────────────────────────────────────────────────────
 def main():
-    logger.info(f"Starting Pi client | device={DEVICE_ID} | simulate={SIMULATE} | interval={INTERVAL_S}s")
+    logger.info(f"Starting Pi client | device={DEVICE_ID} | simulate={SIMULATE} | "
+                f"sample={SAMPLE_S}s | heartbeat={HEARTBEAT_S}s | deadband={DEADBAND_CM}cm")
+    reporter = AdaptiveReporter()
     try:
         while True:
             level = get_water_level_cm()
-            send_reading(level)
-            time.sleep(INTERVAL_S)
+            now = time.monotonic()
+            reason = reporter.observe(level, now)
+            # A failed send is not marked, so the next sample retries the same condition
+            if reason and send_reading(level, reason):
+                reporter.mark_sent(level, now)
+            time.sleep(reporter.next_interval())
     except KeyboardInterrupt:
         logger.info("Stopped.")
     finally: